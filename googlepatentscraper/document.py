@@ -1,292 +1,498 @@
 # -*- coding: utf-8 -*-
-from typing import Union
+from copy import deepcopy
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+from typing import Iterable, Iterator, List, MutableMapping, Tuple, Union
 import requests
-from lxml import html
-from lxml.html import HtmlElement
-import logging
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from lxml import etree
+from googlepatentscraper import __version__
 
 __author__ = "Linus Kohl"
 
+# comments and the id index are never queried, skip them while parsing
+_PARSER_OPTIONS = dict(remove_comments=True, collect_ids=False)
+# subtrees that are never queried, emptied as soon as they are parsed
+_PRUNED_TAGS = ('script', 'style', 'svg', 'noscript')
+# size of the response chunks fed to the parser
+_CHUNK_SIZE = 65536
+# connect and read timeout in seconds
+_TIMEOUT = (5, 30)
+# connections kept open to google patents, more than Document.fetch_many uses by default
+_POOL_SIZE = 32
+
+
+def _session() -> requests.Session:
+    """ Creates the session shared by all documents
+    Connections are kept alive and pooled, failed requests are retried with backoff.
+    Returns:
+        requests.Session: Session negotiating compressed transfer
+    """
+    retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504), raise_on_status=False)
+    session = requests.Session()
+    session.mount('https://', HTTPAdapter(pool_connections=_POOL_SIZE, pool_maxsize=_POOL_SIZE, max_retries=retry))
+    session.headers['User-Agent'] = f"googlepatentscraper/{__version__}"
+    return session
+
+
+_SESSION = _session()
+
+
+def _xpath(path: str) -> etree.XPath:
+    """ Compiles an XPath expression returning plain strings instead of smart strings
+    Args:
+        path (str): XPath selector
+    Returns:
+        etree.XPath: Compiled XPath expression
+    """
+    return etree.XPath(path, smart_strings=False)
+
+
+def _all_elements(xpath: etree.XPath, element: etree._Element) -> List[etree._Element]:
+    """ Returns all elements selected by a compiled XPath query
+    Args:
+        xpath (etree.XPath): Compiled XPath selecting elements
+        element (etree._Element): Context element
+    Returns:
+        list: All selected elements
+    """
+    return xpath(element)
+
+
+def _first_string(xpath: etree.XPath, element: etree._Element) -> Union[str, None]:
+    """ Returns the first text or attribute value selected by a compiled XPath query
+    Args:
+        xpath (etree.XPath): Compiled XPath selecting text() or an attribute
+        element (etree._Element): Context element
+    Returns:
+        str|None: First string or None if nothing matched
+    """
+    res = xpath(element)
+    return res[0] if res else None
+
 
 class Document():
+    __slots__ = ('data',)
+
+    _URL = "https://patents.google.com/patent/{}/en".format
 
-    def __init__(self, number: str):
+    # XPath expressions are compiled once per process and evaluated directly against
+    # the parsed elements instead of going through .xpath() on every call
+    _XP_CONTENT = _xpath("./div[@itemprop='content']")
+    _XP_CODE = _xpath(".//span[@itemprop='Code']/text()")
+    _XP_CLAIMS = _xpath(".//div[@itemprop='content'][1]/*[contains(@class, 'claims')]/*[contains(@class, 'claim')]")
+    _XP_CLAIM_NUM = _xpath("./div[contains(@class,'claim')][1]/@num")
+    _XP_DESCENDANT_TEXT = _xpath("./descendant::*/text()")
+    # keys of meta tags of which only the first content is used
+    _META_KEYS = {
+        'DC.type': 'type',
+        'DC.title': 'title',
+        'DC.description': 'description',
+        'citation_patent_application_number': 'citation_patent_application_number',
+        'citation_pdf_url': 'citation_pdf_url',
+        'citation_patent_publication_number': 'citation_patent_publication_number',
+    }
+    _CITATION_KEYS = {
+        'forwardReferencesOrig': 'forward_citations',
+        'backwardReferencesOrig': 'backward_citations',
+    }
+
+    def __init__(self, number: str = None, content: bytes = None, cache: MutableMapping = None):
         """
         Args:
-            number (str): Hostname
+            number (str): Patent number, e.g. US8400417B2
+            content (bytes): HTML document of the patent, skips fetching the document if set
+            cache (MutableMapping): Processed documents by version and patent number, e.g. a dict, shelve or
+                diskcache.Cache
         Raises:
-            InvalidUrl: If hostname is not set
+            ValueError: If neither number nor content is set
         """
         self.data = {}
-        url = f"https://patents.google.com/patent/{number}/en"
-        response = requests.get(url)
-        if response.ok:
-            self.data = self.__process(response.content)
+        if content is not None:
+            self.data = self.__process((content,))
+        elif number is None:
+            raise ValueError("Either number or content has to be set")
         else:
-            raise Exception("Something went wrong getting the document")
+            # entries of other versions may have been extracted differently
+            key = f"{__version__}:{number}"
+            data = cache.get(key) if cache is not None else None
+            if data is None:
+                data = self.__fetch(number)
+                if cache is not None:
+                    cache[key] = data
+            # changes to the data of this document must not reach the cache
+            self.data = deepcopy(data) if cache is not None else data
 
-    def __get(self, doc: HtmlElement, xpath: str, many: bool = False) -> Union[
-        HtmlElement, str, list, None]:
-        """ Processes xpath queries on the document tree
+    @classmethod
+    def fetch_many(cls, numbers: Iterable[str], concurrency: int = 16,
+                   cache: MutableMapping = None) -> List['Document']:
+        """ Fetches and processes multiple documents concurrently
         Args:
-            doc (HtmlElement): Root element
-            xpath (str): XPath selector
-            many (bool): Expect multiple results, default: False
+            numbers (Iterable[str]): Patent numbers
+            concurrency (int): Number of documents fetched at the same time, default: 16
+            cache (MutableMapping): Processed documents by version and patent number, has to be thread-safe
         Returns:
-            HtmlElement|str|list|None: The result of the query
+            list: Documents in the same order as numbers
         """
-        try:
-            res = doc.xpath(xpath)
-            if many:
-                return res
-            else:
-                if isinstance(res, list):
-                    return res[0]
-                else:
-                    return res
-        except:
-            logging.info(f"XPath query failed: {xpath}")
-            if many:
-                return []
-            else:
-                return None
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return list(executor.map(lambda number: cls(number, cache=cache), numbers))
 
-    def __get_cpcs(self, doc: HtmlElement) -> list:
-        """ Extracts CPC codes from patent
+    @classmethod
+    def stream(cls, numbers: Iterable[str], concurrency: int = 16,
+               cache: MutableMapping = None) -> Iterator[Tuple[str, dict]]:
+        """ Fetches and processes multiple documents concurrently, yielding them as soon as they are complete
         Args:
-            doc (HtmlElement): Root element
-        Returns:
-            list: List containing dictionaries with attributes cpc, first_code
+            numbers (Iterable[str]): Patent numbers
+            concurrency (int): Number of documents fetched at the same time, default: 16
+            cache (MutableMapping): Processed documents by version and patent number, has to be thread-safe
+        Yields:
+            tuple: Patent number and extracted data, in order of completion
         """
-        cpcs = []
-        for element in self.__get(doc, "//li[@itemprop='cpcs']", many=True):
-            cpc = {}
-            cpc['first_code'] = True if \
-                self.__get(element, ".//meta[@itemprop='FirstCode']/@content") == "true" else False
-            cpc['cpc'] = self.__get(element, ".//span[@itemprop='Code']/text()")
-            cpcs.append(cpc)
-        # remove duplicates
-        unique = [dict(t) for t in {tuple(d.items()) for d in cpcs}]
-        return unique
-
-    def __get_description(self, doc: HtmlElement) -> str:
-        """ Extracts long description from patent
+        numbers = iter(numbers)
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            # only a window of documents is in flight, numbers are read as earlier ones complete
+            pending = {executor.submit(cls, number, cache=cache): number for number in islice(numbers, concurrency)}
+            try:
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        number = pending.pop(future)
+                        data = future.result().data
+                        for next_number in islice(numbers, 1):
+                            pending[executor.submit(cls, next_number, cache=cache)] = next_number
+                        yield number, data
+            finally:
+                # don't fetch the remaining documents if the caller stops early or a fetch failed
+                for future in pending:
+                    future.cancel()
+
+    def __fetch(self, number: str) -> dict:
+        """ Fetches and processes patent from google patents
         Args:
-            doc (HtmlElement): Root element
+            number (str): Patent number
         Returns:
-            str: Description from patent
+            dict: Extracted data
         """
-        description = ""
-        for element in self.__get(doc, "//section[@itemprop='description']/div[@itemprop='content']/descendant::*", many=True):
-            if element.text:
-                description += element.text
-            if element.tag == "heading":
-                description += "\n\n"
-            elif element.tag == "li":
-                description += "\n"
-        description = description.strip()
-        return description
-
-    def __get_dates(self, doc: HtmlElement) -> list:
-        """ Extracts dates from patent
+        with _SESSION.get(self._URL(number), stream=True, timeout=_TIMEOUT) as response:
+            if response.ok:
+                return self.__process(response.iter_content(_CHUNK_SIZE))
+            else:
+                raise Exception("Something went wrong getting the document")
+
+    def __index(self, element: etree._Element, *tags: str) -> dict:
+        """ Collects the descendants of an element in a single walk
         Args:
-            doc (HtmlElement): Root element
+            element (etree._Element): Context element, usually a table row
+            tags (str): Tags to collect
         Returns:
-            list: List containing dictionaries with the attributes date, type
+            dict: First descendant for each (tag, itemprop) pair
         """
-        dates = []
-        for date_element in self.__get(doc, "//meta[@name='DC.date']", many=True):
-            date = {}
-            date['date'] = date_element.attrib.get('content')
-            date['type'] = date_element.attrib.get('scheme') or ''
-            dates.append(date)
-        return dates
-
-    def __get_claims(self, doc: HtmlElement) -> list:
-        """ Extracts claims from patent
+        index = {}
+        for descendant in element.iterdescendants(*tags):
+            key = (descendant.tag, descendant.get('itemprop'))
+            if key not in index:
+                index[key] = descendant
+        return index
+
+    def __text(self, element: Union[etree._Element, None]) -> Union[str, None]:
+        """ Returns the text of an element
         Args:
-            doc (HtmlElement): Root element
+            element (etree._Element|None): Element or None if it wasn't found
         Returns:
-            list: List containing dictionaries with the attributes number, text, dependent
+            str|None: Text of the element
+        """
+        return element.text if element is not None else None
+
+    def __handle_meta(self, element: etree._Element, data: dict):
+        """ Extracts document metadata from a meta tag
+        Args:
+            element (etree._Element): meta element
+            data (dict): Extracted data
+        """
+        name = element.get('name')
+        content = element.get('content')
+        if name == 'DC.date':
+            data['dates'].append({'date': content, 'type': element.get('scheme') or ''})
+        elif content is None:
+            return
+        elif name == 'DC.contributor':
+            scheme = element.get('scheme')
+            if scheme == 'inventor':
+                data['inventors'].append(content)
+            elif scheme == 'assignee':
+                data['assignee'].append(content)
+        elif name == 'DC.relation':
+            data['relations'].append(content)
+        elif name in self._META_KEYS:
+            key = self._META_KEYS[name]
+            if data[key] is None:
+                data[key] = content
+
+    def __handle_country(self, element: etree._Element, data: dict):
+        """ Extracts country code or name
+        Args:
+            element (etree._Element): dd element
+            data (dict): Extracted data
+        """
+        key = element.get('itemprop')
+        if data[key] is None and element.text:
+            data[key] = element.text.strip()
+
+    def __handle_abstract(self, element: etree._Element, data: dict):
+        """ Extracts abstract from patent
+        Args:
+            element (etree._Element): Abstract section
+            data (dict): Extracted data
+        """
+        data['abstract'] += "".join(text.strip() for content in _all_elements(self._XP_CONTENT, element)
+                                    for text in content.itertext() if not text.isspace())
+
+    def __handle_cpc(self, element: etree._Element, data: dict):
+        """ Extracts CPC code, duplicates are removed once the document is complete
+        Args:
+            element (etree._Element): li element of the code
+            data (dict): Extracted data
         """
+        first_code = element.find(".//meta[@itemprop='FirstCode']")
+        cpc = {}
+        cpc['first_code'] = first_code is not None and first_code.get('content') == "true"
+        cpc['cpc'] = _first_string(self._XP_CODE, element)
+        data['cpcs'].append(cpc)
+
+    def __handle_description(self, element: etree._Element, data: dict):
+        """ Extracts long description from patent
+        Args:
+            element (etree._Element): Description section
+            data (dict): Extracted data
+        """
+        parts = []
+        for content in _all_elements(self._XP_CONTENT, element):
+            for descendant in content.iterdescendants(etree.Element):
+                if descendant.text:
+                    parts.append(descendant.text)
+                if descendant.tag == "heading":
+                    parts.append("\n\n")
+                elif descendant.tag == "li":
+                    parts.append("\n")
+        data['description_alt'] += "".join(parts)
+
+    def __handle_claims(self, element: etree._Element, data: dict):
+        """ Extracts claims from the first claims section
+        Args:
+            element (etree._Element): Claims section
+            data (dict): Extracted data
+        """
+        if data['claims'] is not None:
+            return
         claims = []
-        claim_section = self.__get(doc, "//section[@itemprop='claims']")
-        if claim_section is not None:
-            for claim in self.__get(claim_section, ".//div[@itemprop='content'][1]/*[contains(@class, 'claims')]/*[contains(@class, 'claim')]", many=True):
-                claim_obj = {}
-                claim_obj['dependent'] = True if claim.get('class') == "claim-dependent" else False
-                claim_obj['number'] = int(self.__get(claim, "./div[contains(@class,'claim')][1]/@num"))
-                text = "".join(claim.xpath("./descendant::*/text()"))
-                claim_obj['text'] = text.strip() if text else None
-                claims.append(claim_obj)
-        return claims
-
-    def __get_priority_claims(self, doc: HtmlElement) -> list:
-        """ Extracts priority claims from patents
+        for claim in _all_elements(self._XP_CLAIMS, element):
+            claim_obj = {}
+            claim_obj['dependent'] = claim.get('class') == "claim-dependent"
+            claim_obj['number'] = int(_first_string(self._XP_CLAIM_NUM, claim))
+            text = "".join(self._XP_DESCENDANT_TEXT(claim))
+            claim_obj['text'] = text.strip() if text else None
+            claims.append(claim_obj)
+        data['claims'] = claims
+
+    def __handle_priority_claim(self, row: etree._Element, data: dict):
+        """ Extracts priority claim with the attributes title, filingDate, priorityDate
         Args:
-            doc (HtmlElement): Root element
-        Returns:
-            list: List containing dictionaries with the attributes title, filingDate, priorityDate
+            row (etree._Element): Table row
+            data (dict): Extracted data
         """
-        priority_claims = []
-        for row in self.__get(doc, "//tr[@itemprop='appsClaimingPriority']", many=True):
-            priority_claim = {}
-            priority_claim['filingDate'] = self.__get(row, ".//td[@itemprop='filingDate']/text()")
-            priority_claim['priorityDate'] = self.__get(row, ".//td[@itemprop='priorityDate']/text()")
-            priority_claim['title'] = self.__get(row, ".//td[@itemprop='title']/text()")
-            priority_claims.append(priority_claim)
-        return priority_claims
-
-    def __get_priority_applications(self, doc: HtmlElement) -> list:
-        """ Extracts priority applications from patent
+        cells = self.__index(row, 'td')
+        priority_claim = {}
+        priority_claim['filingDate'] = self.__text(cells.get(('td', 'filingDate')))
+        priority_claim['priorityDate'] = self.__text(cells.get(('td', 'priorityDate')))
+        priority_claim['title'] = self.__text(cells.get(('td', 'title')))
+        data['priority_claims'].append(priority_claim)
+
+    def __handle_priority_application(self, row: etree._Element, data: dict):
+        """ Extracts priority application with the attributes applicationNumber, isUsProvisional, filingDate,
+            priorityDate
         Args:
-            doc (HtmlElement): Root element
-        Returns:
-            list: List containing dictionaries with the attributes applicationNumber, isUsProvisional, filingDate, priorityDate
+            row (etree._Element): Table row
+            data (dict): Extracted data
         """
-        priority_applications = []
-        for row in self.__get(doc, "//tr[@itemprop='priorityApps']", many=True):
-            application = {}
-            application['filingDate'] = self.__get(row, ".//td[@itemprop='filingDate']/text()")
-            application['priorityDate'] = self.__get(row, ".//td[@itemprop='priorityDate']/text()")
-            application['title'] = self.__get(row, ".//td[@itemprop='title']/text()")
-            content_element = self.__get(row, ".//td[1]")
-            application['applicationNumber'] = self.__get(content_element, ".//span[@itemprop='applicationNumber']/text()")
-            application['isUsProvisional'] = self.__get(content_element, ".//span[@itemprop='isUsProvisional']/text()")
-            priority_applications.append(application)
-        return priority_applications
-
-    def __get_events(self, doc: HtmlElement) -> list:
-        """ Extracts events from patent
+        cells = self.__index(row, 'td')
+        application = {}
+        application['filingDate'] = self.__text(cells.get(('td', 'filingDate')))
+        application['priorityDate'] = self.__text(cells.get(('td', 'priorityDate')))
+        application['title'] = self.__text(cells.get(('td', 'title')))
+        content_element = row[0] if len(row) else None
+        content = self.__index(content_element, 'span') if content_element is not None else {}
+        application['applicationNumber'] = self.__text(content.get(('span', 'applicationNumber')))
+        application['isUsProvisional'] = self.__text(content.get(('span', 'isUsProvisional')))
+        data['priority_applications'].append(application)
+
+    def __handle_event(self, row: etree._Element, data: dict):
+        """ Extracts event with the attributes title, time, type, critical
         Args:
-            doc (HtmlElement): Root element
-        Returns:
-            list: List containing dictionaries with the attributes title, time, type, critical
+            row (etree._Element): dd element of the event
+            data (dict): Extracted data
         """
-        events = []
-        for row in self.__get(doc, "//dd[@itemprop='events']", many=True):
-            event = {}
-            event['time'] = self.__get(row, ".//time[@itemprop='date']/text()")
-            event['title'] = self.__get(row, ".//span[@itemprop='title']/text()")
-            event['type'] = self.__get(row, ".//span[@itemprop='type']/text()")
-            event['critical'] = True if self.__get(row, ".//span[@itemprop='critical']/text()") == 'Critical' else False
-            events.append(event)
-        return events
-
-    def __get_legal_events(self, doc: HtmlElement) -> list:
-        """ Extracts legal events from patent
+        fields = self.__index(row, 'time', 'span')
+        event = {}
+        event['time'] = self.__text(fields.get(('time', 'date')))
+        event['title'] = self.__text(fields.get(('span', 'title')))
+        event['type'] = self.__text(fields.get(('span', 'type')))
+        event['critical'] = self.__text(fields.get(('span', 'critical'))) == 'Critical'
+        data['events'].append(event)
+
+    def __handle_legal_event(self, row: etree._Element, data: dict):
+        """ Extracts legal event with the attributes date, code, title, content {title, text}
         Args:
-            doc (HtmlElement): Root element
-        Returns:
-            list: List containing dictionaries with the attributes date, code, title, content {title, text}
+            row (etree._Element): Table row
+            data (dict): Extracted data
         """
-        events = []
-        for row in self.__get(doc, "//tr[@itemprop='legalEvents']", many=True):
-            event = {}
-            event['date'] = self.__get(row, ".//td/time[@itemprop='date']/text()")
-            event['code'] = self.__get(row, ".//td[@itemprop='code']/text()")
-            event['title'] = self.__get(row, ".//td[@itemprop='title']/text()")
-            content = []
-            content_element = self.__get(row, ".//td[4]")
-            for p in self.__get(content_element, ".//p", many=True):
-                cont = {}
-                cont['title'] = self.__get(p, ".//strong/text()")
-                cont['text'] = self.__get(p, ".//span/text()")
+        cells = self.__index(row, 'td', 'time')
+        event = {}
+        event['date'] = self.__text(cells.get(('time', 'date')))
+        event['code'] = self.__text(cells.get(('td', 'code')))
+        event['title'] = self.__text(cells.get(('td', 'title')))
+        content = []
+        content_element = row[3] if len(row) > 3 else None
+        if content_element is not None:
+            for p in content_element.iterdescendants('p'):
+                cont = {'title': None, 'text': None}
+                for element in p.iterdescendants('strong', 'span'):
+                    key = 'title' if element.tag == 'strong' else 'text'
+                    if cont[key] is None:
+                        cont[key] = element.text
                 content.append(cont)
-            event['content'] = content
-            events.append(event)
-        return events
+        event['content'] = content
+        data['legal_events'].append(event)
 
-    def __get_similar_documents(self, doc: HtmlElement) -> list:
-        """ Extracts similar documents from patent
+    def __handle_similar_document(self, row: etree._Element, data: dict):
+        """ Extracts similar document with the attributes date, title, isPatent, publicationNumber, primaryLanguage
         Args:
-            doc (HtmlElement): Root element
-        Returns:
-            list: List containing dictionaries with the attributes date, title, isPatent, publicationNumber, primaryLanguage
+            row (etree._Element): Table row
+            data (dict): Extracted data
+        """
+        cells = self.__index(row, 'td', 'time')
+        document = {}
+        document['date'] = self.__text(cells.get(('time', 'publicationDate')))
+        title = self.__text(cells.get(('td', 'title')))
+        document['title'] = title.strip() if title else None
+        content_element = row[0] if len(row) else None
+        if content_element is not None:
+            content = self.__index(content_element, 'meta', 'span')
+            is_patent = content.get(('meta', 'isPatent'))
+            document['isPatent'] = is_patent is not None and is_patent.get('content') == 'true'
+            document['publiationNumber'] = self.__text(content.get(('span', 'publicationNumber')))
+            document['primaryLanguage'] = self.__text(content.get(('span', 'primaryLanguage')))
+        data['similar_documents'].append(document)
+
+    def __handle_citation(self, row: etree._Element, data: dict):
+        """ Extracts forward or backward citation with the attributes priorityDate, publicationDate,
+            assigneeOriginal, title, examinerCited, publicationNumber, primaryLanguage
+        Args:
+            row (etree._Element): Table row
+            data (dict): Extracted data
         """
-        similar_documents = []
-        for row in self.__get(doc, "//tr[@itemprop='similarDocuments']", many=True):
-            document = {}
-            document['date'] = self.__get(row, ".//time[@itemprop='publicationDate']/text()")
-            title = self.__get(row, ".//td[@itemprop='title']/text()")
-            document['title'] = title.strip() if title else None
-            content_element = self.__get(row, ".//td[1]")
-            if content_element is not None:
-                document['isPatent'] = True if self.__get(content_element, ".//meta[@itemprop='isPatent']/@content") == 'true' else False
-                document['publiationNumber'] = self.__get(content_element, ".//span[@itemprop='publicationNumber']/text()")
-                document['primaryLanguage'] = self.__get(content_element, ".//span[@itemprop='primaryLanguage']/text()")
-            similar_documents.append(document)
-        return similar_documents
-
-    def __get_citations(self, doc: HtmlElement, direction: str) -> list:
-        """ Extracts citations from patent
+        cells = self.__index(row, 'td', 'span')
+        citation = {}
+        citation['priorityDate'] = self.__text(cells.get(('td', 'priorityDate')))
+        citation['publicationDate'] = self.__text(cells.get(('td', 'publicationDate')))
+        assigneeOriginal = self.__text(cells.get(('span', 'assigneeOriginal')))
+        citation['assigneeOriginal'] = assigneeOriginal.strip() if assigneeOriginal else None
+        title = self.__text(cells.get(('td', 'title')))
+        citation['title'] = title.strip() if title else None
+        content_element = row[0] if len(row) else None
+        if content_element is not None:
+            content = self.__index(content_element, 'span')
+            citation['examinerCited'] = self.__text(content.get(('span', 'examinerCited'))) == "*"
+            citation['publiationNumber'] = self.__text(content.get(('span', 'publicationNumber')))
+            citation['primaryLanguage'] = self.__text(content.get(('span', 'primaryLanguage')))
+        data[self._CITATION_KEYS[row.get('itemprop')]].append(citation)
+
+    # handlers by tag and itemprop of the elements they extract from
+    _HANDLERS = {
+        ('meta', None): __handle_meta,
+        ('dd', 'countryCode'): __handle_country,
+        ('dd', 'countryName'): __handle_country,
+        ('section', 'abstract'): __handle_abstract,
+        ('section', 'description'): __handle_description,
+        ('section', 'claims'): __handle_claims,
+        ('li', 'cpcs'): __handle_cpc,
+        ('tr', 'appsClaimingPriority'): __handle_priority_claim,
+        ('tr', 'priorityApps'): __handle_priority_application,
+        ('dd', 'events'): __handle_event,
+        ('tr', 'legalEvents'): __handle_legal_event,
+        ('tr', 'similarDocuments'): __handle_similar_document,
+        ('tr', 'forwardReferencesOrig'): __handle_citation,
+        ('tr', 'backwardReferencesOrig'): __handle_citation,
+    }
+    # the parser only reports the end of these elements
+    _EVENT_TAGS = tuple({tag for tag, _ in _HANDLERS}.union(_PRUNED_TAGS))
+
+    def __dispatch(self, parser: etree.HTMLPullParser, data: dict):
+        """ Passes the elements parsed so far to their handlers and frees their subtrees
         Args:
-            doc (HtmlElement): Root element
-            direction (str): Type of citations forward|backward
-        Returns:
-            list: List containing dictionaries with the attributes priorityDate, publicationDate, assigneeOriginal, title,
-                  examinerCited, publicationNumber, primaryLanguage
+            parser (etree.HTMLPullParser): Parser fed with the document
+            data (dict): Extracted data
         """
-        citations = []
-        itemprop = ""
-        if direction == "forward":
-            itemprop = "forwardReferencesOrig"
-        elif direction == "backward":
-            itemprop = "backwardReferencesOrig"
-        for row in self.__get(doc, "//tr[@itemprop='{}']".format(itemprop),
-                              many=True):
-            citation = {}
-            citation['priorityDate'] = self.__get(row, ".//td[@itemprop='priorityDate']/text()")
-            citation['publicationDate'] = self.__get(row, ".//td[@itemprop='publicationDate']/text()")
-            assigneeOriginal = self.__get(row, ".//td/span[@itemprop='assigneeOriginal']/text()")
-            citation['assigneeOriginal'] = assigneeOriginal.strip() if assigneeOriginal else None
-            title = self.__get(row, ".//td[@itemprop='title']/text()")
-            citation['title'] = title.strip() if title else None
-            content_element = self.__get(row, ".//td[1]")
-            if content_element is not None:
-                citation['examinerCited'] = True if self.__get(content_element, ".//span[@itemprop='examinerCited']/text()") == "*" else False
-                citation['publiationNumber'] = self.__get(content_element, ".//span[@itemprop='publicationNumber']/text()")
-                citation['primaryLanguage'] = self.__get(content_element, ".//span[@itemprop='primaryLanguage']/text()")
-            citations.append(citation)
-        return citations
-
-    def __process(self, content: bytes) -> dict:
-        """ Process patent
+        for _, element in parser.read_events():
+            handler = self._HANDLERS.get((element.tag, element.get('itemprop')))
+            if handler is not None:
+                handler(self, element, data)
+                element.clear(keep_tail=True)
+            elif element.tag in _PRUNED_TAGS:
+                element.clear(keep_tail=True)
+
+    def __process(self, chunks: Iterable[bytes]) -> dict:
+        """ Process patent in a single pass while it is parsed
         Args:
-            content (bytes): HTML document of the patent
+            chunks (Iterable[bytes]): HTML document of the patent
         Returns:
-            list: List containing dictionaries with the attributes priorityDate, publicationDate,
-                  assigneeOriginal, title, examinerCited, publicationNumber, primaryLanguage
+            dict: Extracted data
         """
-        doc = html.fromstring(content)
-        data = {}
-        data['inventors'] = self.__get(doc, "//meta[@name='DC.contributor' and @scheme='inventor']/@content", many=True)
-        data['assignee'] = self.__get(doc, "//meta[@name='DC.contributor' and @scheme='assignee']/@content", many=True)
-        data['type'] = self.__get(doc, "//meta[@name='DC.type']/@content")
-        title = self.__get(doc, "//meta[@name='DC.title']/@content")
-        data['title'] = title.strip() if title else None
-        description = self.__get(doc, "//meta[@name='DC.description']/@content")
-        data['description'] = description.strip() if description else None
-        data['abstract'] = self.__get(doc, "//section[@itemprop='abstract']/div[@itemprop='content']/descendant::*/text()", many=True)
-        data['abstract'] = "".join([p.strip() for p in data['abstract']])
-        countryCode = self.__get(doc, "//dd[@itemprop='countryCode']/text()")
-        data['countryCode'] = countryCode.strip() if countryCode else None
-        countryName = self.__get(doc, "//dd[@itemprop='countryName']/text()")
-        data['countryName'] = countryName.strip() if countryName else None
-        data['citation_patent_application_number'] = self.__get(doc, "//meta[@name='citation_patent_application_number']/@content")
-        data['citation_pdf_url'] = self.__get(doc, "//meta[@name='citation_pdf_url']/@content")
-        data['citation_patent_publication_number'] = self.__get(doc, "//meta[@name='citation_patent_publication_number']/@content")
-        data['relations'] = self.__get(doc, "//meta[@name='DC.relation']/@content", many=True)
-        # call extraction functions
-        data['cpcs'] = self.__get_cpcs(doc)
-        data['description_alt'] = self.__get_description(doc)
-        data['dates'] = self.__get_dates(doc)
-        data['claims'] = self.__get_claims(doc)
-        data['priority_claims'] = self.__get_priority_claims(doc)
-        data['priority_applications'] = self.__get_priority_applications(doc)
-        data['events'] = self.__get_events(doc)
-        data['legal_events'] = self.__get_legal_events(doc)
-        data['similar_documents'] = self.__get_similar_documents(doc)
-        data['forward_citations'] = self.__get_citations(doc, "forward")
-        data['backward_citations'] = self.__get_citations(doc, "backward")
-        return data
\ No newline at end of file
+        data = {
+            'inventors': [],
+            'assignee': [],
+            'type': None,
+            'title': None,
+            'description': None,
+            'abstract': "",
+            'countryCode': None,
+            'countryName': None,
+            'citation_patent_application_number': None,
+            'citation_pdf_url': None,
+            'citation_patent_publication_number': None,
+            'relations': [],
+            'cpcs': [],
+            'description_alt': "",
+            'dates': [],
+            'claims': None,
+            'priority_claims': [],
+            'priority_applications': [],
+            'events': [],
+            'legal_events': [],
+            'similar_documents': [],
+            'forward_citations': [],
+            'backward_citations': [],
+        }
+        # feed parsers keep per document state, so they can't be shared
+        parser = etree.HTMLPullParser(events=('end',), tag=self._EVENT_TAGS, **_PARSER_OPTIONS)
+        for chunk in chunks:
+            parser.feed(chunk)
+            self.__dispatch(parser, data)
+        parser.close()
+        self.__dispatch(parser, data)
+        # finish fields that are collected from several elements
+        data['title'] = data['title'].strip() if data['title'] else None
+        data['description'] = data['description'].strip() if data['description'] else None
+        data['description_alt'] = data['description_alt'].strip()
+        if data['claims'] is None:
+            data['claims'] = []
+        cpcs = []
+        seen = set()
+        for cpc in data['cpcs']:
+            # the same code is listed once per classification it belongs to
+            key = (cpc['cpc'], cpc['first_code'])
+            if key not in seen:
+                seen.add(key)
+                cpcs.append(cpc)
+        data['cpcs'] = cpcs
+        return data